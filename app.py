@@ -1,25 +1,61 @@
-from flask import Flask, request, jsonify, render_template_string
-from flask_cors import CORS
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
 import firebase_admin
-from firebase_admin import credentials, firestore
-import qrcode
+from firebase_admin import credentials, firestore_async
+from google.api_core import retry_async
+from google.api_core.exceptions import Aborted, DeadlineExceeded, InvalidArgument, ServiceUnavailable
+from cachetools import TTLCache
+from celery import Celery
+import segno
+from segno.consts import MODE_ALPHANUMERIC, MODE_BYTE
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+from email.mime.image import MIMEImage
+import asyncio
+import atexit
+import gzip
+import logging
 import uuid
 import os
 import io
 import base64
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from jinja2 import Environment
 from dotenv import load_dotenv
 from datetime import datetime 
+from urllib.parse import urlsplit
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
+# Log through a queue so stream writes happen on a listener thread, not in request handlers
+logger = logging.getLogger('esya')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue = queue.Queue(-1)
+logger.addHandler(QueueHandler(_log_queue))
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+_log_listener = QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+app = Quart(__name__)
+app = cors(app)
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024
+
+# Keep ticket documents small; Firestore rejects documents over 1 MiB
+MAX_NAME_LENGTH = 100
+MAX_EMAIL_LENGTH = 254
+
+# Background task queue for ticket emails
+celery = Celery('esya', broker=os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
 
 # Initialize Firebase
 try:
@@ -37,35 +73,343 @@ try:
         "client_x509_cert_url": os.getenv('FIREBASE_CLIENT_CERT_URL')
     })
     firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    print("Firebase initialized successfully")
-except Exception as e:
-    print(f"Firebase initialization error: {e}")
+    db = firestore_async.client()
+    logger.info("Firebase initialized successfully")
+except Exception:
+    logger.exception("Firebase initialization error")
     db = None
 
+TICKETS = db.collection('tickets') if db else None
+
+class TokenBucket:
+    """Async token bucket refilling at `rate` tokens per second"""
+    
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity or rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+    
+    async def acquire(self, tokens=1):
+        """Wait until `tokens` are available, then take them"""
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot take {tokens} tokens from a bucket holding {self.capacity}")
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+# Ticket writes are buffered and committed in batches (Firestore allows 500 writes per batch)
+MAX_WRITE_BATCH = 500
+WRITE_FLUSH_INTERVAL = float(os.getenv('WRITE_FLUSH_INTERVAL', '0.01'))
+WRITE_BUFFER_SIZE = int(os.getenv('WRITE_BUFFER_SIZE', '10000'))
+MAX_CONCURRENT_COMMITS = int(os.getenv('MAX_CONCURRENT_COMMITS', '40'))
+WRITE_TIMEOUT = float(os.getenv('WRITE_TIMEOUT', '30'))
+# Stay under Firestore's sustained 10k writes/s, split across the server's worker processes
+# (WEB_CONCURRENCY, also read by gunicorn and uvicorn) unless set explicitly per process
+WRITE_RATE_LIMIT = int(os.getenv('WRITE_RATE_LIMIT') or 10000 // max(int(os.getenv('WEB_CONCURRENCY', '1')), 1))
+if WRITE_RATE_LIMIT <= 0:
+    raise ValueError("WRITE_RATE_LIMIT must be a positive number of writes per second")
+# Transient Firestore errors are retried with exponential backoff (0.1s, 0.2s, ... up to 2s, for 10s)
+WRITE_RETRY = retry_async.AsyncRetry(
+    predicate=retry_async.if_exception_type(Aborted, DeadlineExceeded, ServiceUnavailable),
+    initial=0.1,
+    maximum=2.0,
+    multiplier=2.0,
+    deadline=10.0
+)
+_write_buffer = None
+_writer_task = None
+_commit_slots = None
+_commit_tasks = set()
+_held_writes = []  # dequeued by the writer, not yet handed to a commit
+# Capacity covers a full batch so a limit below MAX_WRITE_BATCH still lets batches through
+_write_limiter = TokenBucket(WRITE_RATE_LIMIT, capacity=max(WRITE_RATE_LIMIT, MAX_WRITE_BATCH))
+
+async def store_ticket(ticket_id, ticket_data):
+    """Buffer a ticket write and wait until its batch is committed"""
+    if _writer_task is None or _writer_task.done():
+        raise RuntimeError("Ticket writer is not running")
+    
+    future = asyncio.get_running_loop().create_future()
+    # Raises QueueFull when WRITE_BUFFER_SIZE writes are already waiting
+    _write_buffer.put_nowait((ticket_id, ticket_data, future))
+    try:
+        await asyncio.wait_for(future, WRITE_TIMEOUT)
+    finally:
+        # Mark the write abandoned if we gave up or were cancelled before it committed
+        future.cancel()
+
+async def _drain_write_buffer():
+    """Wait for a buffered write, then hold whatever arrives within the flush interval"""
+    _held_writes.append(await _write_buffer.get())
+    if _write_buffer.qsize() < MAX_WRITE_BATCH - 1:
+        await asyncio.sleep(WRITE_FLUSH_INTERVAL)
+    while len(_held_writes) < MAX_WRITE_BATCH and not _write_buffer.empty():
+        _held_writes.append(_write_buffer.get_nowait())
+
+def _take_pending_writes():
+    """Take every write the writer holds or has buffered"""
+    items = _held_writes[:]
+    _held_writes.clear()
+    while not _write_buffer.empty():
+        items.append(_write_buffer.get_nowait())
+    return items
+
+async def _commit_batch(items):
+    """Commit one batch of buffered writes and resolve the waiting requests"""
+    # Skip registrations that already timed out or whose client went away;
+    # they got no ticket email, so they must not be stored either
+    items = [item for item in items if not item[2].done()]
+    if not items:
+        _commit_slots.release()
+        return
+    
+    results = None
+    try:
+        try:
+            batch = db.batch()
+            for ticket_id, ticket_data, _ in items:
+                batch.set(TICKETS.document(ticket_id), ticket_data)
+            await batch.commit(retry=WRITE_RETRY)
+            results = [None] * len(items)
+        except InvalidArgument:
+            # A batch is atomic, so one rejected document fails all of them;
+            # write them one at a time so only the bad registration fails
+            results = await asyncio.gather(
+                *(TICKETS.document(ticket_id).set(ticket_data, retry=WRITE_RETRY)
+                  for ticket_id, ticket_data, _ in items),
+                return_exceptions=True
+            )
+    except Exception as e:
+        results = [e] * len(items)
+    finally:
+        _commit_slots.release()
+        
+        for (_, _, future), result in zip(items, results or [None] * len(items)):
+            if future.done():
+                continue
+            if results is None:
+                future.cancel()
+            elif isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(None)
+
+def _dispatch_commit(items):
+    """Commit a batch in the background (caller holds a commit slot)"""
+    task = asyncio.create_task(_commit_batch(items))
+    _commit_tasks.add(task)
+    task.add_done_callback(_commit_tasks.discard)
+
+async def _ticket_writer():
+    """Drain the write buffer, keeping up to MAX_CONCURRENT_COMMITS batches in flight"""
+    while True:
+        await _drain_write_buffer()
+        await _write_limiter.acquire(len(_held_writes))
+        await _commit_slots.acquire()
+        items = _held_writes[:]
+        _held_writes.clear()
+        _dispatch_commit(items)
+
+def _on_writer_done(task):
+    """Log a crashed writer and fail the registrations waiting on it"""
+    if task.cancelled():
+        return
+    error = task.exception()
+    logger.error("Ticket writer stopped", exc_info=error)
+    for _, _, future in _take_pending_writes():
+        if not future.done():
+            future.set_exception(error)
+
+@app.before_serving
+async def start_ticket_writer():
+    global _write_buffer, _writer_task, _commit_slots
+    if db:
+        _write_buffer = asyncio.Queue(maxsize=WRITE_BUFFER_SIZE)
+        _commit_slots = asyncio.Semaphore(MAX_CONCURRENT_COMMITS)
+        _writer_task = asyncio.create_task(_ticket_writer())
+        _writer_task.add_done_callback(_on_writer_done)
+
+@app.after_serving
+async def stop_ticket_writer():
+    if _writer_task:
+        _writer_task.cancel()
+        await asyncio.gather(_writer_task, return_exceptions=True)
+        
+        # Flush writes the writer had not handed to a commit yet
+        items = _take_pending_writes()
+        for start in range(0, len(items), MAX_WRITE_BATCH):
+            await _commit_slots.acquire()
+            _dispatch_commit(items[start:start + MAX_WRITE_BATCH])
+        await asyncio.gather(*_commit_tasks, return_exceptions=True)
+
+class SMTPPool:
+    """Thread-safe pool of logged-in SMTP connections"""
+    
+    def __init__(self, server, port, user, password, max_conns=None, idle_timeout=None):
+        self.server = server
+        self.port = port
+        self.user = user
+        self.password = password
+        self.idle_timeout = idle_timeout or int(os.getenv('SMTP_IDLE_TIMEOUT', '60'))
+        self._idle = queue.Queue(maxsize=max_conns or int(os.getenv('SMTP_POOL_SIZE', '5')))
+    
+    def _connect(self):
+        conn = smtplib.SMTP(self.server, self.port, timeout=30)
+        conn.starttls()
+        conn.login(self.user, self.password)
+        return conn
+    
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+    
+    def get_conn(self):
+        """Reuse an idle connection, or open and log in a new one"""
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            
+            if time.monotonic() - last_used < self.idle_timeout:
+                return conn
+            self._close(conn)
+    
+    def put_conn(self, conn):
+        """Return a connection to the pool if it still answers NOOP"""
+        try:
+            alive = conn.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            alive = False
+        
+        if alive:
+            try:
+                self._idle.put_nowait((conn, time.monotonic()))
+                return
+            except queue.Full:
+                pass
+        self._close(conn)
+    
+    @contextmanager
+    def get(self):
+        conn = self.get_conn()
+        try:
+            yield conn
+        except Exception:
+            self._close(conn)
+            raise
+        self.put_conn(conn)
+
+_smtp_pools = {}
+_smtp_pools_lock = threading.Lock()
+
+def get_smtp_pool(server, port, user, password):
+    """Get the shared SMTP pool for a (server, port, user) triple"""
+    with _smtp_pools_lock:
+        pool = _smtp_pools.get((server, port, user))
+        if pool is None:
+            pool = _smtp_pools[(server, port, user)] = SMTPPool(server, port, user, password)
+        return pool
+
 def generate_qr_code(ticket_id):
     """Generate QR code for ticket validation"""
-    validation_url = f"{os.getenv('BASE_URL', 'http://localhost:5000')}/validate/{ticket_id}"
+    base_url = urlsplit(os.getenv('BASE_URL', 'http://localhost:5000').rstrip('/'))
     
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+    # Scheme, host and ticket ID are case-insensitive, so upper-case them and
+    # encode them as alphanumeric segments; only the route stays in byte mode.
+    # The host segment's mode is left to segno in case it has characters
+    # outside the alphanumeric set.
+    segments = (
+        (f"{base_url.scheme}://{base_url.netloc}".upper(), None),
+        (f"{base_url.path}/validate/", MODE_BYTE),
+        (ticket_id.upper(), MODE_ALPHANUMERIC),
     )
-    qr.add_data(validation_url)
-    qr.make(fit=True)
     
-    # Create QR code image
-    qr_img = qr.make_image(fill_color="black", back_color="white")
+    return _qr_bytes(segments)
+
+@lru_cache(maxsize=4096)
+def _qr_bytes(segments):
+    """Render validation URL segments as a PNG QR code (memoized, output is deterministic)"""
+    qr = segno.make(list(segments), error='l', micro=False)
     
-    # Convert to bytes
+    # Convert to PNG bytes
     img_buffer = io.BytesIO()
-    qr_img.save(img_buffer, format='PNG')
-    img_buffer.seek(0)
+    qr.save(img_buffer, kind='png', scale=10, border=4)
     
     return img_buffer.getvalue()
 
+# Ticket email body, compiled once; values are autoescaped at render time
+EMAIL_TEMPLATE = Environment(autoescape=True).from_string("""
+<html>
+<body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center;">
+        <h1 style="margin: 0; font-size: 28px;">🎊 ESYA FEST 2025 🎊</h1>
+        <p style="margin: 10px 0 0 0; font-size: 16px;">Your Digital Ticket</p>
+    </div>
+    
+    <div style="padding: 30px; background: #f8f9fa;">
+        <h2 style="color: #333; margin-bottom: 20px;">Hello {{ name }}! 👋</h2>
+        
+        <p style="color: #555; font-size: 16px; line-height: 1.6;">
+            Congratulations! Your registration for ESYA Fest has been confirmed. 
+            Your unique ticket QR code is below.
+        </p>
+        
+        <div style="text-align: center; margin: 20px 0;">
+            <img src="cid:qr" width="260" alt="Ticket QR code">
+        </div>
+        
+        <div style="background: white; padding: 20px; border-radius: 10px; margin: 20px 0; border-left: 4px solid #667eea;">
+            <h3 style="color: #333; margin-top: 0;">📋 Ticket Details</h3>
+            <p><strong>Name:</strong> {{ name }}</p>
+            <p><strong>Email:</strong> {{ email }}</p>
+            <p><strong>Ticket ID:</strong> {{ ticket_id }}</p>
+            <p><strong>Status:</strong> ✅ Active</p>
+            <p><strong>Day:</strong> {{ day }}</p>
+
+        </div>
+        
+        <div style="background: #e3f2fd; padding: 20px; border-radius: 10px; margin: 20px 0;">
+            <h3 style="color: #1976d2; margin-top: 0;">📱 How to Use Your Ticket</h3>
+            <ol style="color: #555; line-height: 1.8;">
+                <li>Save the QR code image to your phone</li>
+                <li>Present the QR code at the fest entrance</li>
+                <li>Our scanner will validate your entry</li>
+                <li>Enjoy the fest! 🎉</li>
+            </ol>
+        </div>
+        
+        <div style="background: #fff3e0; padding: 15px; border-radius: 8px; margin: 20px 0;">
+            <p style="color: #f57c00; margin: 0; font-weight: bold;">
+                ⚠️ Important: This ticket can only be used once. Keep it safe!
+            </p>
+        </div>
+        
+        <p style="color: #555; font-size: 14px; margin-top: 30px;">
+            See you at ESYA Fest! 🚀<br>
+            - The ESYA Team
+        </p>
+    </div>
+    
+    <div style="background: #333; color: white; padding: 20px; text-align: center; font-size: 12px;">
+        <p>ESYA Fest 2025 | Powered by QR Ticketing System</p>
+    </div>
+</body>
+</html>
+""")
+
 def send_email_with_qr(name, email, ticket_id, qr_code_data,day):
     """Send email with QR code ticket"""
     try:
@@ -79,95 +423,47 @@ def send_email_with_qr(name, email, ticket_id, qr_code_data,day):
             raise ValueError("Email credentials not configured")
         
         # Create message
-        msg = MIMEMultipart()
+        msg = MIMEMultipart('related')
         msg['From'] = f"ESYA Fest <{sender_email}>"
         msg['To'] = email
         msg['Subject'] = f"🎉 Your ESYA Fest Ticket - {ticket_id[:8]}"
         
         # Email body
-        body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center;">
-                <h1 style="margin: 0; font-size: 28px;">🎊 ESYA FEST 2025 🎊</h1>
-                <p style="margin: 10px 0 0 0; font-size: 16px;">Your Digital Ticket</p>
-            </div>
-            
-            <div style="padding: 30px; background: #f8f9fa;">
-                <h2 style="color: #333; margin-bottom: 20px;">Hello {name}! 👋</h2>
-                
-                <p style="color: #555; font-size: 16px; line-height: 1.6;">
-                    Congratulations! Your registration for ESYA Fest has been confirmed. 
-                    Your unique ticket is attached as a QR code.
-                </p>
-                
-                <div style="background: white; padding: 20px; border-radius: 10px; margin: 20px 0; border-left: 4px solid #667eea;">
-                    <h3 style="color: #333; margin-top: 0;">📋 Ticket Details</h3>
-                    <p><strong>Name:</strong> {name}</p>
-                    <p><strong>Email:</strong> {email}</p>
-                    <p><strong>Ticket ID:</strong> {ticket_id}</p>
-                    <p><strong>Status:</strong> ✅ Active</p>
-                    <p><strong>Day:</strong> {day}</p>
-
-                </div>
-                
-                <div style="background: #e3f2fd; padding: 20px; border-radius: 10px; margin: 20px 0;">
-                    <h3 style="color: #1976d2; margin-top: 0;">📱 How to Use Your Ticket</h3>
-                    <ol style="color: #555; line-height: 1.8;">
-                        <li>Save the QR code image to your phone</li>
-                        <li>Present the QR code at the fest entrance</li>
-                        <li>Our scanner will validate your entry</li>
-                        <li>Enjoy the fest! 🎉</li>
-                    </ol>
-                </div>
-                
-                <div style="background: #fff3e0; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                    <p style="color: #f57c00; margin: 0; font-weight: bold;">
-                        ⚠️ Important: This ticket can only be used once. Keep it safe!
-                    </p>
-                </div>
-                
-                <p style="color: #555; font-size: 14px; margin-top: 30px;">
-                    See you at ESYA Fest! 🚀<br>
-                    - The ESYA Team
-                </p>
-            </div>
-            
-            <div style="background: #333; color: white; padding: 20px; text-align: center; font-size: 12px;">
-                <p>ESYA Fest 2025 | Powered by QR Ticketing System</p>
-            </div>
-        </body>
-        </html>
-        """
+        body = EMAIL_TEMPLATE.render(name=name, email=email, ticket_id=ticket_id, day=day)
         
         msg.attach(MIMEText(body, 'html'))
         
-        # Attach QR code
-        qr_attachment = MIMEBase('application', 'octet-stream')
-        qr_attachment.set_payload(qr_code_data)
-        encoders.encode_base64(qr_attachment)
-        qr_attachment.add_header(
-            'Content-Disposition',
-            f'attachment; filename="ESYA_Ticket_{ticket_id[:8]}.png"'
-        )
-        msg.attach(qr_attachment)
+        # Embed QR code inline, referenced from the body as cid:qr
+        qr_image = MIMEImage(qr_code_data, _subtype='png')
+        qr_image.add_header('Content-ID', '<qr>')
+        qr_image.add_header('Content-Disposition', 'inline', filename=f'ESYA_Ticket_{ticket_id[:8]}.png')
+        msg.attach(qr_image)
         
-        # Send email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
-        server.quit()
+        # Send email over a pooled connection, retrying once if it was dropped
+        pool = get_smtp_pool(smtp_server, smtp_port, sender_email, sender_password)
+        for attempt in range(2):
+            try:
+                with pool.get() as server:
+                    server.send_message(msg)
+                break
+            except smtplib.SMTPServerDisconnected:
+                if attempt:
+                    raise
         
         return True
-    except Exception as e:
-        print(f"Email sending error: {e}")
+    except Exception:
+        logger.exception("Email sending error")
         return False
 
-@app.route('/')
-def index():
-    """Serve the frontend"""
-    return render_template_string("""
+@celery.task(bind=True, max_retries=3, default_retry_delay=30)
+def send_ticket_email(self, name, email, ticket_id, day):
+    """Generate the QR code and email the ticket (runs on a Celery worker)"""
+    qr_code_data = generate_qr_code(ticket_id)
+    
+    if not send_email_with_qr(name, email, ticket_id, qr_code_data, day):
+        raise self.retry()
+
+INDEX_HTML = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -444,7 +740,7 @@ select:focus {
                     
                     if (response.ok) {
                         showMessage(
-                            `🎉 Registration successful! Your ticket has been sent to ${email}. 
+                            `🎉 Registration successful! Your ticket is on its way to ${email}. 
                             Check your inbox for the QR code. Ticket ID: ${data.ticket_id.substring(0, 8)}...`, 
                             'success'
                         );
@@ -475,13 +771,23 @@ select:focus {
         </script>
     </body>
     </html>
-    """)
+    """
+INDEX_GZ = gzip.compress(INDEX_HTML.encode('utf-8'))
+
+@app.route('/')
+async def index():
+    """Serve the frontend"""
+    headers = {'Cache-Control': 'public, max-age=3600', 'Vary': 'Accept-Encoding'}
+    if request.accept_encodings['gzip'] > 0:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(INDEX_GZ, mimetype='text/html', headers=headers)
+    return Response(INDEX_HTML, mimetype='text/html', headers=headers)
 
 @app.route('/register', methods=['POST'])
-def register():
+async def register():
     """Register a new user and send QR code ticket"""
     try:
-        data = request.get_json()
+        data = await request.get_json()
         name = data.get('name', '').strip()
         email = data.get('email', '').strip()
         day = data.get('day', '').strip()
@@ -491,11 +797,11 @@ def register():
         if not name or not email:
             return jsonify({'error': 'Name and email are required'}), 400
         
-        # Generate unique ticket ID
-        ticket_id = str(uuid.uuid4())
+        if len(name) > MAX_NAME_LENGTH or len(email) > MAX_EMAIL_LENGTH:
+            return jsonify({'error': 'Name or email is too long'}), 400
         
-        # Generate QR code
-        qr_code_data = generate_qr_code(ticket_id)
+        # Generate unique ticket ID
+        ticket_id = uuid.uuid4().hex
         
         # Store ticket in Firebase
         if db:
@@ -509,100 +815,134 @@ def register():
     'scanned_at': None
 }
             
-            db.collection('tickets').document(ticket_id).set(ticket_data)
-        
-        # Send email with QR code
-        email_sent = send_email_with_qr(name, email, ticket_id, qr_code_data,day)
+            await store_ticket(ticket_id, ticket_data)
         
-        if not email_sent:
-            return jsonify({'error': 'Failed to send email. Please try again.'}), 500
+        # Queue the QR code email; the worker handles rendering and SMTP
+        await asyncio.to_thread(send_ticket_email.delay, name, email, ticket_id, day)
         
         return jsonify({
-            'message': 'Registration successful! Check your email for the QR code.',
+            'message': 'Registration successful! Your QR code ticket will arrive by email shortly.',
             'ticket_id': ticket_id
-        }), 201
+        }), 202
         
-    except Exception as e:
-        print(f"Registration error: {e}")
+    except Exception:
+        logger.exception("Registration error")
         return jsonify({'error': 'Registration failed'}), 500
 
+DATABASE_ERROR_HTML = """
+<div style="text-align: center; padding: 50px; font-family: Arial;">
+    <h2 style="color: red;">❌ Database Error</h2>
+    <p>Unable to connect to database</p>
+</div>
+"""
+
+INVALID_TICKET_HTML = """
+<div style="text-align: center; padding: 50px; font-family: Arial;">
+    <h2 style="color: red;">❌ Invalid Ticket</h2>
+    <p>This ticket does not exist</p>
+</div>
+"""
+
+VALIDATION_ERROR_HTML = """
+<div style="text-align: center; padding: 50px; font-family: Arial;">
+    <h2 style="color: red;">❌ Validation Error</h2>
+    <p>Unable to validate ticket</p>
+</div>
+"""
+
+# Pages with ticket details are compiled once; values are autoescaped at render time
+ALREADY_USED_TEMPLATE = app.jinja_env.from_string("""
+<div style="text-align: center; padding: 50px; font-family: Arial;">
+    <h2 style="color: orange;">⚠️ Already Used</h2>
+    <p>This ticket has already been scanned</p>
+    <div style="margin-top: 30px; padding: 20px; background: #f8f9fa; border-radius: 10px;">
+        <h3>Ticket Details:</h3>
+        <p><strong>Name:</strong> {{ name }}</p>
+        <p><strong>Email:</strong> {{ email }}</p>
+        <p><strong>Originally scanned:</strong> {{ scanned_at }}</p>
+    </div>
+</div>
+""")
+
+VALID_TICKET_TEMPLATE = app.jinja_env.from_string("""
+<div style="text-align: center; padding: 50px; font-family: Arial;">
+    <h1 style="color: green;">✅ Valid Ticket!</h1>
+    <h2 style="color: #333; margin-top: 30px;">Welcome to ESYA Fest!</h2>
+    
+    <div style="margin: 30px auto; padding: 30px; background: linear-gradient(135deg, #667eea, #764ba2); color: white; border-radius: 15px; max-width: 400px;">
+        <h3 style="margin-bottom: 20px;">🎫 Ticket Validated</h3>
+        <p><strong>Name:</strong> {{ name }}</p>
+        <p><strong>Email:</strong> {{ email }}</p>
+        <p><strong>Entry Time:</strong> {{ entry_time }}</p>
+    </div>
+    
+    <div style="margin-top: 40px; padding: 20px; background: #d4edda; border-radius: 10px; border: 1px solid #c3e6cb;">
+        <p style="color: #155724; font-size: 18px; font-weight: bold;">
+            🎉 Enjoy the fest! 🎉
+        </p>
+    </div>
+</div>
+""")
+
+# Repeat scans of used tickets and unknown IDs are answered without a Firestore read
+scanned_tickets = TTLCache(maxsize=100_000, ttl=3600)
+unknown_tickets = TTLCache(maxsize=100_000, ttl=60)
+
 @app.route('/validate/<ticket_id>')
-def validate_ticket(ticket_id):
+async def validate_ticket(ticket_id):
     """Validate and mark ticket as scanned"""
+    ticket_id = ticket_id.lower()
     try:
         if not db:
-            return render_template_string("""
-            <div style="text-align: center; padding: 50px; font-family: Arial;">
-                <h2 style="color: red;">❌ Database Error</h2>
-                <p>Unable to connect to database</p>
-            </div>
-            """), 500
+            return DATABASE_ERROR_HTML, 500
+        
+        if ticket_id in unknown_tickets:
+            return INVALID_TICKET_HTML, 404
+        if ticket_id in scanned_tickets:
+            return await ALREADY_USED_TEMPLATE.render_async(**scanned_tickets[ticket_id])
         
         # Get ticket from Firebase
-        ticket_ref = db.collection('tickets').document(ticket_id)
-        ticket_doc = ticket_ref.get()
+        ticket_ref = TICKETS.document(ticket_id)
+        ticket_doc = await ticket_ref.get()
         
         if not ticket_doc.exists:
-            return render_template_string("""
-            <div style="text-align: center; padding: 50px; font-family: Arial;">
-                <h2 style="color: red;">❌ Invalid Ticket</h2>
-                <p>This ticket does not exist</p>
-            </div>
-            """), 404
+            unknown_tickets[ticket_id] = True
+            return INVALID_TICKET_HTML, 404
         
         ticket_data = ticket_doc.to_dict()
         
         if ticket_data.get('scanned', False):
-            return render_template_string(f"""
-            <div style="text-align: center; padding: 50px; font-family: Arial;">
-                <h2 style="color: orange;">⚠️ Already Used</h2>
-                <p>This ticket has already been scanned</p>
-                <div style="margin-top: 30px; padding: 20px; background: #f8f9fa; border-radius: 10px;">
-                    <h3>Ticket Details:</h3>
-                    <p><strong>Name:</strong> {ticket_data.get('name', 'N/A')}</p>
-                    <p><strong>Email:</strong> {ticket_data.get('email', 'N/A')}</p>
-                    <p><strong>Originally scanned:</strong> {ticket_data.get('scanned_at', 'N/A')}</p>
-                </div>
-            </div>
-            """)
+            scanned_tickets[ticket_id] = {
+                'name': ticket_data.get('name', 'N/A'),
+                'email': ticket_data.get('email', 'N/A'),
+                'scanned_at': ticket_data.get('scanned_at', 'N/A')
+            }
+            return await ALREADY_USED_TEMPLATE.render_async(**scanned_tickets[ticket_id])
         
         # Mark ticket as scanned
-        ticket_ref.update({
+        scanned_at = datetime.now()
+        await ticket_ref.update({
             'scanned': True,
-            'scanned_at': datetime.now()
-        })
+            'scanned_at': scanned_at
+        }, retry=WRITE_RETRY)
+        scanned_tickets[ticket_id] = {
+            'name': ticket_data.get('name', 'N/A'),
+            'email': ticket_data.get('email', 'N/A'),
+            'scanned_at': scanned_at
+        }
         
-        return render_template_string(f"""
-        <div style="text-align: center; padding: 50px; font-family: Arial;">
-            <h1 style="color: green;">✅ Valid Ticket!</h1>
-            <h2 style="color: #333; margin-top: 30px;">Welcome to ESYA Fest!</h2>
-            
-            <div style="margin: 30px auto; padding: 30px; background: linear-gradient(135deg, #667eea, #764ba2); color: white; border-radius: 15px; max-width: 400px;">
-                <h3 style="margin-bottom: 20px;">🎫 Ticket Validated</h3>
-                <p><strong>Name:</strong> {ticket_data.get('name', 'N/A')}</p>
-                <p><strong>Email:</strong> {ticket_data.get('email', 'N/A')}</p>
-                <p><strong>Entry Time:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-            </div>
-            
-            <div style="margin-top: 40px; padding: 20px; background: #d4edda; border-radius: 10px; border: 1px solid #c3e6cb;">
-                <p style="color: #155724; font-size: 18px; font-weight: bold;">
-                    🎉 Enjoy the fest! 🎉
-                </p>
-            </div>
-        </div>
-        """)
+        return await VALID_TICKET_TEMPLATE.render_async(
+            name=ticket_data.get('name', 'N/A'),
+            email=ticket_data.get('email', 'N/A'),
+            entry_time=scanned_at.strftime('%Y-%m-%d %H:%M:%S')
+        )
         
-    except Exception as e:
-        print(f"Validation error: {e}")
-        return render_template_string("""
-        <div style="text-align: center; padding: 50px; font-family: Arial;">
-            <h2 style="color: red;">❌ Validation Error</h2>
-            <p>Unable to validate ticket</p>
-        </div>
-        """), 500
+    except Exception:
+        logger.exception("Validation error")
+        return VALIDATION_ERROR_HTML, 500
 
 @app.route('/health')
-def health():
+async def health():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
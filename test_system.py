@@ -63,7 +63,7 @@ def test_registration():
             timeout=30
         )
         
-        if response.status_code == 201:
+        if response.status_code == 202:
             data = response.json()
             ticket_id = data.get('ticket_id')
             print_result(True, "Registration successful")
@@ -150,7 +150,7 @@ def test_invalid_validation():
     """Test validation with invalid ticket ID"""
     print_header("INVALID VALIDATION TEST")
     
-    fake_ticket_id = "00000000-0000-0000-0000-000000000000"
+    fake_ticket_id = "0" * 32
     
     try:
         response = requests.get(f"{BASE_URL}/validate/{fake_ticket_id}", timeout=10)
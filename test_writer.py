@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the batched Firestore ticket writer
+Run with: python -m unittest test_writer
+"""
+
+import asyncio
+import unittest
+
+from google.api_core.exceptions import InvalidArgument
+
+import app
+
+
+class FakeDocument:
+    def __init__(self, store, ticket_id):
+        self.store = store
+        self.id = ticket_id
+
+    async def set(self, ticket_data, retry=None):
+        if ticket_data.get('reject'):
+            raise InvalidArgument('document rejected')
+        self.store.written.append(self.id)
+
+
+class FakeBatch:
+    def __init__(self, store):
+        self.store = store
+        self.writes = []
+
+    def set(self, document, ticket_data):
+        self.writes.append((document.id, ticket_data))
+
+    async def commit(self, retry=None):
+        await asyncio.sleep(0)
+        if self.store.commit_error:
+            raise self.store.commit_error
+        if any(ticket_data.get('reject') for _, ticket_data in self.writes):
+            raise InvalidArgument('batch rejected')
+        self.store.batches.append(len(self.writes))
+        self.store.written.extend(ticket_id for ticket_id, _ in self.writes)
+
+
+class FakeFirestore:
+    """Just enough of the async Firestore client for the ticket writer"""
+
+    def __init__(self):
+        self.batches = []
+        self.written = []
+        self.commit_error = None
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def collection(self, name):
+        return self
+
+    def document(self, ticket_id):
+        return FakeDocument(self, ticket_id)
+
+
+class TicketWriterTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.saved = (app.db, app.TICKETS, app._write_limiter)
+        self.firestore = FakeFirestore()
+        app.db = app.TICKETS = self.firestore
+        app._write_limiter = app.TokenBucket(1_000_000)
+        app._held_writes.clear()
+        await app.start_ticket_writer()
+
+    async def asyncTearDown(self):
+        await app.stop_ticket_writer()
+        app.db, app.TICKETS, app._write_limiter = self.saved
+
+    async def test_burst_is_split_into_full_batches(self):
+        await asyncio.gather(*(app.store_ticket(str(i), {}) for i in range(1200)))
+
+        self.assertEqual(self.firestore.batches, [500, 500, 200])
+        self.assertEqual(len(self.firestore.written), 1200)
+
+    async def test_failed_commit_reaches_every_waiter_and_frees_the_slot(self):
+        self.firestore.commit_error = RuntimeError('commit failed')
+
+        results = await asyncio.gather(
+            *(app.store_ticket(str(i), {}) for i in range(10)),
+            return_exceptions=True
+        )
+
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(app._commit_slots._value, app.MAX_CONCURRENT_COMMITS)
+
+        self.firestore.commit_error = None
+        await app.store_ticket('after', {})
+        self.assertEqual(self.firestore.written, ['after'])
+
+    async def test_rejected_document_only_fails_its_own_registration(self):
+        results = await asyncio.gather(
+            *(app.store_ticket(str(i), {'reject': i == 3}) for i in range(10)),
+            return_exceptions=True
+        )
+
+        self.assertIsInstance(results[3], InvalidArgument)
+        self.assertEqual([r for i, r in enumerate(results) if i != 3], [None] * 9)
+        self.assertEqual(sorted(self.firestore.written), [str(i) for i in range(10) if i != 3])
+
+    async def test_cancelled_waiter_is_not_written(self):
+        abandoned = asyncio.create_task(app.store_ticket('abandoned', {}))
+        kept = asyncio.create_task(app.store_ticket('kept', {}))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+
+        await kept
+        self.assertEqual(self.firestore.written, ['kept'])
+        self.assertEqual(app._commit_slots._value, app.MAX_CONCURRENT_COMMITS)
+
+    async def test_shutdown_commits_held_writes(self):
+        waiters = [asyncio.create_task(app.store_ticket(str(i), {})) for i in range(30)]
+        await asyncio.sleep(0)
+
+        await app.stop_ticket_writer()
+
+        self.assertEqual(await asyncio.gather(*waiters), [None] * 30)
+        self.assertEqual(len(self.firestore.written), 30)
+
+
+class TokenBucketTest(unittest.IsolatedAsyncioTestCase):
+    async def test_full_batch_fits_a_limit_below_the_batch_size(self):
+        # Same sizing as the module-level write limiter
+        bucket = app.TokenBucket(300, capacity=max(300, app.MAX_WRITE_BATCH))
+
+        await asyncio.wait_for(bucket.acquire(app.MAX_WRITE_BATCH), 1)
+        await asyncio.wait_for(bucket.acquire(app.MAX_WRITE_BATCH), 3)
+
+    async def test_waits_for_refill(self):
+        bucket = app.TokenBucket(1000)
+        await bucket.acquire(1000)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await bucket.acquire(100)
+        self.assertGreaterEqual(loop.time() - start, 0.09)
+
+    async def test_rejects_impossible_requests(self):
+        with self.assertRaises(ValueError):
+            app.TokenBucket(0)
+        with self.assertRaises(ValueError):
+            await app.TokenBucket(100).acquire(101)
+
+
+if __name__ == '__main__':
+    unittest.main()